@@ -5,7 +5,7 @@ import tempfile
 import os
 import os.path
 import sys
-from typing import Union, IO
+from typing import Dict, IO, Iterable, List, Tuple, Union
 fsync = os.fsync
 if sys.platform != "win32":
     import fcntl
@@ -122,3 +122,95 @@ class SaveFile:
                 # Otherwise, retry the entire procedure.
                 self._file.close()
                 self._file = file_new
+
+
+def saveFiles(files: Iterable[Tuple[str, str]], encoding: str = "utf-8") -> Dict[str, OSError]:
+    """Atomically write a batch of text files.
+
+    Like with SaveFile, every file is first written to a temporary file next to
+    it, which then replaces the original file. But instead of waiting for each
+    file to reach the disk before writing the next one, all files are written
+    before any of them are synced, so that the operating system can flush them
+    to disk together. Each directory is synced only once at the end.
+
+    Unlike SaveFile, this doesn't lock the files. The caller should make sure
+    that no other instance of the application writes these files at the same
+    time, e.g. by holding a LockFile.
+
+    :param files: Pairs of the path to write to and the text to write there.
+    :param encoding: The encoding to use while writing the files.
+    :return: The errors that prevented files from being written, by path. The
+    other files were written successfully.
+    """
+
+    errors = {}  # type: Dict[str, OSError]
+    temp_paths = []  # type: List[Tuple[str, str]]  # The temporary file for each path, if it could be written.
+    for path, data in files:
+        try:
+            with tempfile.NamedTemporaryFile("wt", dir = os.path.dirname(path), encoding = encoding, delete = False) as temp_file:
+                temp_paths.append((temp_file.name, path))
+                temp_file.write(data)
+        except OSError as e:
+            errors[path] = e
+
+    directories_to_sync = set()
+    for temp_path, path in temp_paths:
+        if path in errors:  # Couldn't even write the temporary file.
+            _removeTempFile(temp_path)
+            continue
+        try:
+            # The data needs to be on disk before replacing, or a crash could leave an empty file instead of either version.
+            # Syncing needs write access on Windows, so the file can't be opened read-only for this.
+            temp_fd = os.open(temp_path, os.O_RDWR)
+            try:
+                fsync(temp_fd)
+            finally:
+                os.close(temp_fd)
+            _replaceFile(temp_path, path)
+        except OSError as e:
+            errors[path] = e
+            _removeTempFile(temp_path)
+            continue
+        directories_to_sync.add(os.path.dirname(path))
+
+    # Make sure that the replacements themselves are on disk too. Directories can't be opened on Windows.
+    if sys.platform != "win32":
+        for directory in directories_to_sync:
+            try:
+                directory_fd = os.open(directory, os.O_RDONLY)
+                try:
+                    fsync(directory_fd)
+                finally:
+                    os.close(directory_fd)
+            except OSError:  # Some file systems don't support syncing directories.
+                pass
+
+    return errors
+
+
+def _replaceFile(temp_path: str, path: str) -> None:
+    """Replace a file with a temporary file, retrying like SaveFile does.
+
+    On Windows, a PermissionError means that another process has the file open
+    for a moment, so that is always retried. Other errors are retried a few
+    times before giving up.
+    """
+
+    max_retries = 10
+    while True:
+        try:
+            os.replace(temp_path, path)
+            return
+        except PermissionError:
+            continue
+        except OSError:
+            if max_retries <= 0:
+                raise
+            max_retries -= 1
+
+
+def _removeTempFile(temp_path: str) -> None:
+    try:
+        os.remove(temp_path)
+    except OSError:  # Already gone, or someone else has it open. Either way there's nothing more we can do.
+        pass
@@ -156,6 +156,21 @@ class ContainerProvider(PluginObject):
 
         raise NotImplementedError("The container provider {class_name} doesn't properly implement loadMetadata.".format(class_name = self.__class__.__name__))
 
+    def prefetchMetadata(self, container_ids: Iterable[str]) -> None:
+        """Prepares to load the metadata of a lot of containers at once.
+
+        This is called during start-up, right before loadMetadata is called for
+        each of these containers. Providers may use it to do the slow part of
+        loading up front, for instance reading all of the files in parallel.
+        Whatever loadMetadata does must still be done by loadMetadata, on the
+        thread that calls it. By default this does nothing.
+
+        :param container_ids: The IDs of the containers whose metadata will be
+        loaded.
+        """
+
+        pass
+
     def metadata(self) -> Dict[str, Dict[str, Any]]:
         """Gets a dictionary of metadata of all containers, indexed by ID."""
 
@@ -20,7 +20,14 @@ class ContainerQuery:
     comparing. This is done to simplify the caching code in ContainerRegistry.
     """
 
-    cache = {}  # type: Dict[Tuple[Any, ...], ContainerQuery]  # To speed things up, we're keeping a cache of the container queries we've executed before.
+    # To speed things up, we're keeping a cache of the container queries we've executed before. There is a separate
+    # cache for each container type that queries filter on (or None if they don't), so that the caches can be cleared
+    # per type of container. Each is kept in order of use so that the least recently used queries can be evicted when it
+    # gets too large.
+    cache = {}  # type: Dict[Optional[type], collections.OrderedDict[Tuple[Any, ...], ContainerQuery]]
+
+    # The maximum number of queries to keep in the cache of each container type.
+    MaxQueryCacheSize = 10000
 
     # If a field is provided in the format "[t1|t2|t3|...]", try to find if any of the given tokens is present in the
     # value. Use regex to do matching because certain fields such as name can be filled by a user and it can be string
@@ -86,6 +93,7 @@ class ContainerQuery:
         # filter. At every step we check the cache and store the query in the
         # cache if it's not there yet.
         key_so_far = (self._ignore_case, )  # type: Tuple[Any, ...]
+        cache = self.cache.setdefault(self.getContainerType(), collections.OrderedDict())
         if candidates is None:
             filtered_candidates: Union[ValuesView[Dict[str, Any]], List[Dict[str, Any]]] = self._registry.metadata.values()
         else:
@@ -94,8 +102,9 @@ class ContainerQuery:
         # Filter on all the key-word arguments one by one.
         for key, value in self._kwargs.items():  # For each progressive filter...
             key_so_far += (key, value)
-            if candidates is None and key_so_far in self.cache:
-                filtered_candidates = cast(List[Dict[str, Any]], self.cache[key_so_far].getResult())
+            if candidates is None and key_so_far in cache:
+                cache.move_to_end(key_so_far)  # Mark as most recently used.
+                filtered_candidates = cast(List[Dict[str, Any]], cache[key_so_far].getResult())
                 continue
 
             # Find the filter to execute.
@@ -117,9 +126,11 @@ class ContainerQuery:
 
             # Store the result in the cache.
             if candidates is None:  # Only cache if we didn't pre-filter candidates.
+                while len(cache) >= self.MaxQueryCacheSize:
+                    cache.popitem(last = False)  # Evict the least recently used query.
                 cached_arguments = dict(zip(key_so_far[1::2], key_so_far[2::2]))
-                self.cache[key_so_far] = ContainerQuery(self._registry, ignore_case = self._ignore_case, **cached_arguments)  # Cache this query for the next time.
-                self.cache[key_so_far]._result = filtered_candidates
+                cache[key_so_far] = ContainerQuery(self._registry, ignore_case = self._ignore_case, **cached_arguments)  # Cache this query for the next time.
+                cache[key_so_far]._result = filtered_candidates
 
         if not isinstance(filtered_candidates, list):
             filtered_candidates = list(filtered_candidates)
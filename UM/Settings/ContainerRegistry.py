@@ -1,13 +1,13 @@
 # Copyright (c) 2022 Ultimaker B.V.
 # Uranium is released under the terms of the LGPLv3 or higher.
 
+import bisect  # To insert container providers in order of priority.
 import gc
 import re  # For finding containers with asterisks in the constraints and for detecting backup files.
 import time
 import sqlite3 as db
-from typing import Any, cast, Dict, List, Optional, Set, Type, TYPE_CHECKING
+from typing import Any, cast, Dict, List, Optional, Set, Tuple, Type, TYPE_CHECKING
 import os
-import UM.Dictionary
 import UM.FlameProfiler
 from UM.LockFile import LockFile
 from UM.Logger import Logger
@@ -55,12 +55,14 @@ class ContainerRegistry(ContainerRegistryInterface):
 
         self._emptyInstanceContainer = empty_container  # type: InstanceContainer
 
-        # Sorted list of container providers (keep it sorted by sorting each time you add one!).
+        # Sorted list of container providers (keep it sorted by inserting each one you add in the right place!).
         self._providers = []  # type: List[ContainerProvider]
+        self._provider_priorities = {}  # type: Dict[str, int]  # Priority of the container providers, by plug-in ID.
         PluginRegistry.addType("container_provider", self.addProvider)
 
         self.metadata = {}  # type: Dict[str, metadata_type]
         self._containers = {}  # type: Dict[str, ContainerInterface]
+        self._dirty_ids = set()  # type: Set[str]  # IDs of the loaded containers that may have to be saved.
         self._wrong_container_ids = set() # type: Set[str]  # Set of already known wrong containers that must be skipped
         self.source_provider = {}  # type: Dict[str, Optional[ContainerProvider]]  # Where each container comes from.
         # Ensure that the empty container is added to the ID cache.
@@ -84,6 +86,14 @@ class ContainerRegistry(ContainerRegistryInterface):
 
         self._explicit_read_only_container_ids = set()  # type: Set[str]
 
+    # While loading all containers, update the user interface after this many containers have been loaded...
+    ProcessEventsInterval = 25
+    # ... or when this many seconds have passed since the last update, whichever comes first.
+    ProcessEventsMaxDelay = 0.05
+
+    # Matches names that end with a number like " #2", as added by uniqueName.
+    number_suffix_regex = re.compile(r"(.*?)\s*#\d+$")
+
     containerAdded = Signal()
     containerRemoved = Signal()
     containerMetaDataChanged = Signal()
@@ -111,9 +121,20 @@ class ContainerRegistry(ContainerRegistryInterface):
     def addProvider(self, provider: ContainerProvider) -> None:
         """Adds a container provider to search through containers in."""
 
-        self._providers.append(provider)
-        # Re-sort every time. It's quadratic, but there shouldn't be that many providers anyway...
-        self._providers.sort(key = lambda provider: PluginRegistry.getInstance().getMetaData(provider.getPluginId())["container_provider"].get("priority", 0))
+        # The providers are kept sorted by priority, so insert it in the right place. Providers with the same priority stay in the order they were added.
+        bisect.insort_right(self._providers, provider, key = self._getProviderPriority)
+
+    def _getProviderPriority(self, provider: ContainerProvider) -> int:
+        """Get the priority of a container provider, as listed in the metadata of its plug-in.
+
+        The priority is looked up in the plug-in registry only once per plug-in, since it's needed for every
+        comparison while inserting a provider.
+        """
+
+        plugin_id = provider.getPluginId()
+        if plugin_id not in self._provider_priorities:
+            self._provider_priorities[plugin_id] = PluginRegistry.getInstance().getMetaData(plugin_id)["container_provider"].get("priority", 0)
+        return self._provider_priorities[plugin_id]
 
     def findDefinitionContainers(self, **kwargs: Any) -> List[DefinitionContainerInterface]:
         """Find all DefinitionContainer objects matching certain criteria.
@@ -197,6 +218,12 @@ class ContainerRegistry(ContainerRegistryInterface):
         list if nothing was found.
         """
 
+        # Fast path for the most common query: a container that is already loaded, by its ID.
+        if not ignore_case and len(kwargs) == 1 and "id" in kwargs:
+            container_id = kwargs["id"]
+            if container_id in self._containers and "*" not in container_id:
+                return [self._containers[container_id]]
+
         # Find the metadata of the containers and grab the actual containers from there.
         results_metadata = self.findContainersMetadata(ignore_case = ignore_case, **kwargs)
         result = []
@@ -332,6 +359,26 @@ class ContainerRegistry(ContainerRegistryInterface):
             return False  # If no provider had the container, that means that the container was only in memory. Then it's always modifiable.
         return provider.isReadOnly(container_id)
 
+    def markDirty(self, container: ContainerInterface) -> None:
+        """Remember that a container became dirty, so that it gets saved by saveDirtyContainers.
+
+        :param container: The container that became dirty.
+        """
+
+        container_id = container.getId()
+        if self._containers.get(container_id) is container:  # Containers that aren't in the registry get checked when they are added.
+            self._dirty_ids.add(container_id)
+
+    def markClean(self, container: ContainerInterface) -> None:
+        """Forget about a container that is no longer dirty.
+
+        :param container: The container that is no longer dirty.
+        """
+
+        container_id = container.getId()
+        if self._containers.get(container_id) is container:  # A copy with the same ID doesn't make the original clean.
+            self._dirty_ids.discard(container_id)
+
     # Gets the container file path with for the container with the given ID. Returns None if the container/file doesn't
     # exist.
     def getContainerFilePathById(self, container_id: str) -> Optional[str]:
@@ -459,6 +506,9 @@ class ContainerRegistry(ContainerRegistryInterface):
             provider_container_ids = set(provider.getAllIds())
             # Keep a list of all the ID's that we know off
             all_container_ids.update(provider_container_ids)
+
+            # First find out which containers need to be read from file.
+            ids_to_load = []  # type: List[Tuple[str, Optional[float], float]]  # Container ID, last modified time in the database (None if not in there yet) and of the file.
             for container_id in provider_container_ids:
                 try:
                     db_last_modified_time = self._getProfileModificationTime(container_id, cursor)
@@ -468,13 +518,28 @@ class ContainerRegistry(ContainerRegistryInterface):
                     cursor = self._getDatabaseConnection().cursor()  # After recreating the database, all the cursors have changed.
                     cursor.execute("begin")
                     db_last_modified_time = self._getProfileModificationTime(container_id, cursor)
+                modified_time = provider.getLastModifiedTime(container_id)
+                if db_last_modified_time is None or modified_time > db_last_modified_time:
+                    # Item is not yet in the database, or the metadata in the database is outdated.
+                    ids_to_load.append((container_id, db_last_modified_time, modified_time))
+                    continue
+
+                # Since we know that the container exists, we also know that it will never be None.
+                container_type = cast(str, self._getProfileType(container_id, cursor))
+
+                # No need to do any file reading, we can just get it from the database.
+                self.metadata[container_id] = self._getMetadataFromDatabase(container_id, container_type)
+                self.source_provider[container_id] = provider
+
+            # Then let the provider prepare to load them all at once (e.g. by reading the files in parallel), before loading them.
+            provider.prefetchMetadata([container_id for container_id, _, _ in ids_to_load])
+            for container_id, db_last_modified_time, modified_time in ids_to_load:
+                metadata = provider.loadMetadata(container_id)
                 if db_last_modified_time is None:
                     # Item is not yet in the database. Add it now!
-                    metadata = provider.loadMetadata(container_id)
                     if not self._isMetadataValid(metadata):
                         Logger.log("w", f"Invalid metadata for container {container_id}: {metadata}")
                         continue
-                    modified_time = provider.getLastModifiedTime(container_id)
                     if metadata.get("type") in self._database_handlers:
                         # Only add it to the database if we have an actual handler.
                         try:
@@ -487,34 +552,19 @@ class ContainerRegistry(ContainerRegistryInterface):
                             cursor = self._getDatabaseConnection().cursor()  # After recreating the database, all the cursors have changed.
                             cursor.execute("begin")
                         self._addMetadataToDatabase(metadata)
-
-                    self.metadata[container_id] = metadata
-                    self.source_provider[container_id] = provider
-
                 else:
-                    # Metadata already exists in database.
-                    modified_time = provider.getLastModifiedTime(container_id)
-                    if modified_time > db_last_modified_time:
-                        # Metadata is outdated, so load from file and update the database
-                        metadata = provider.loadMetadata(container_id)
-                        try:
-                            cursor.execute("UPDATE containers SET name = ?, last_modified = ?, container_type = ? WHERE id = ?", (metadata["name"], modified_time, metadata["type"], metadata["id"]))
-                        except db.DatabaseError as e:
-                            Logger.warning(f"Unable to update timestamp of container cache in database, recreating database: {str(e)}")
-                            self._recreateCorruptDataBase(self._database_handlers[metadata["type"]].cursor)
-                            cursor = self._getDatabaseConnection().cursor()  # After recreating the database, all the cursors have changed.
-                            cursor.execute("begin")
-                        self._updateMetadataInDatabase(metadata)
-                        self.metadata[container_id] = metadata
-                        self.source_provider[container_id] = provider
-                        continue
-
-                    # Since we know that the container exists, we also know that it will never be None.
-                    container_type = cast(str, self._getProfileType(container_id, cursor))
-
-                    # No need to do any file reading, we can just get it from the database.
-                    self.metadata[container_id] = self._getMetadataFromDatabase(container_id, container_type)
-                    self.source_provider[container_id] = provider
+                    # Metadata is outdated, so update the database.
+                    try:
+                        cursor.execute("UPDATE containers SET name = ?, last_modified = ?, container_type = ? WHERE id = ?", (metadata["name"], modified_time, metadata["type"], metadata["id"]))
+                    except db.DatabaseError as e:
+                        Logger.warning(f"Unable to update timestamp of container cache in database, recreating database: {str(e)}")
+                        self._recreateCorruptDataBase(self._database_handlers[metadata["type"]].cursor)
+                        cursor = self._getDatabaseConnection().cursor()  # After recreating the database, all the cursors have changed.
+                        cursor.execute("begin")
+                    self._updateMetadataInDatabase(metadata)
+
+                self.metadata[container_id] = metadata
+                self.source_provider[container_id] = provider
 
         cursor.execute("commit")
 
@@ -532,7 +582,7 @@ class ContainerRegistry(ContainerRegistryInterface):
             cursor.execute("commit")
 
         Logger.log("d", "Loading metadata into container registry took %s seconds", time.time() - resource_start_time)
-        gc.enable()
+        self._enableGarbageCollection()
         ContainerRegistry.allMetadataLoaded.emit()
 
     def _removeContainerFromDatabase(self, container_id: str) -> None:
@@ -553,23 +603,46 @@ class ContainerRegistry(ContainerRegistryInterface):
         resource_start_time = time.time()
 
         with self.lockCache():  # Because we might be writing cache files.
+            num_loaded = 0
+            last_processed_events_time = time.monotonic()
             for provider in self._providers:
                 for container_id in list(provider.getAllIds()):  # Make copy of all IDs since it might change during iteration.
                     if container_id not in self._containers:
-                        # Update UI while loading.
-                        self._application.processEvents()  # Update the user interface because loading takes a while. Specifically the loading screen.
+                        # Update the user interface because loading takes a while. Specifically the loading screen.
+                        # Processing events is not free though, so only do it every few containers.
+                        if num_loaded % self.ProcessEventsInterval == 0 or time.monotonic() - last_processed_events_time > self.ProcessEventsMaxDelay:
+                            self._application.processEvents()
+                            last_processed_events_time = time.monotonic()
+                        num_loaded += 1
                         try:
-                            self._containers[container_id] = provider.loadContainer(container_id)
+                            container = provider.loadContainer(container_id)
                         except:
                             Logger.logException("e", "Failed to load container %s", container_id)
                             raise
-                        self.metadata[container_id] = self._containers[container_id].getMetaData()
+                        if hasattr(container, "metaDataChanged"):
+                            container.metaDataChanged.connect(self._onContainerMetaDataChanged)
+                        self._containers[container_id] = container
+                        if container.isDirty():
+                            self._dirty_ids.add(container_id)
+                        self.metadata[container_id] = container.getMetaData()  # A reference to the container's own metadata, not a copy.
                         self.source_provider[container_id] = provider
                         self.containerLoadComplete.emit(container_id)
 
-        gc.enable()
+        self._enableGarbageCollection()
         Logger.log("d", "Loading data into container registry took %s seconds", time.time() - resource_start_time)
 
+    @staticmethod
+    def _enableGarbageCollection() -> None:
+        """Enable garbage collection again after loading.
+
+        Whatever got loaded stays around for the rest of the application's lifetime, so it's moved to the permanent
+        generation where later collections won't traverse it again. Collect first so that no garbage gets frozen.
+        """
+
+        gc.enable()
+        gc.collect()
+        gc.freeze()
+
     @UM.FlameProfiler.profile
     def addContainer(self, container: ContainerInterface) -> bool:
         container_id = container.getId()
@@ -581,6 +654,8 @@ class ContainerRegistry(ContainerRegistryInterface):
 
         self.metadata[container_id] = container.getMetaData()
         self._containers[container_id] = container
+        if container.isDirty():
+            self._dirty_ids.add(container_id)
         if container_id not in self.source_provider:
             self.source_provider[container_id] = None  # Added during runtime.
         self._clearQueryCacheByContainer(container)
@@ -617,6 +692,7 @@ class ContainerRegistry(ContainerRegistryInterface):
             if hasattr(container, "metaDataChanged"):
                 container.metaDataChanged.disconnect(self._onContainerMetaDataChanged)
             del self._containers[container_id]
+            self._dirty_ids.discard(container_id)
         if container_id in self.metadata:
             if container is None:
                 # We're in a bit of a weird state now. We want to notify the rest of the code that the container
@@ -669,6 +745,9 @@ class ContainerRegistry(ContainerRegistryInterface):
                 source_provider.removeContainer(container.getId())
             container.getMetaData()["id"] = new_id
             self._containers[container.getId()] = container
+            self._dirty_ids.discard(container_id)
+            if container.isDirty():
+                self._dirty_ids.add(container.getId())
             self.metadata[container.getId()] = container.getMetaData()
             self.source_provider[container.getId()] = None  # to be saved with saveSettings
 
@@ -690,19 +769,31 @@ class ContainerRegistry(ContainerRegistryInterface):
         original = original.replace("*", "")  # Filter out wildcards, since this confuses the ContainerQuery.
         name = original.strip()
 
-        num_check = re.compile(r"(.*?)\s*#\d+$").match(name)
+        num_check = self.number_suffix_regex.match(name)
         if num_check: #There is a number in the name.
             name = num_check.group(1) #Filter out the number.
 
+        # Collect the taken IDs (case-insensitive) and names once, instead of querying for every candidate name.
+        taken_ids = set()  # type: Set[str]
+        taken_names = set()  # type: Set[str]
+        for metadata in self.metadata.values():
+            if "id" in metadata:
+                taken_ids.add(str(metadata["id"]).lower())
+            if "name" in metadata:
+                taken_names.add(str(metadata["name"]))
+
+        def isTaken(candidate: str) -> bool:
+            return candidate.lower() in taken_ids or candidate in taken_names
+
         if not name: #Wait, that deleted everything!
             name = "Profile"
-        elif not self.findContainersMetadata(id = original.strip(), ignore_case = True) and not self.findContainersMetadata(name = original.strip()):
+        elif not isTaken(original.strip()):
             # Check if the stripped version of the name is unique (note that this can still have the number in it)
             return original.strip()
 
         unique_name = name
         i = 1
-        while self.findContainersMetadata(id = unique_name, ignore_case = True) or self.findContainersMetadata(name = unique_name): #A container already has this name.
+        while isTaken(unique_name): #A container already has this name.
             i += 1 #Try next numbering.
             unique_name = "%s #%d" % (name, i) #Fill name like this: "Extruder #2".
         return unique_name
@@ -729,7 +820,19 @@ class ContainerRegistry(ContainerRegistryInterface):
         """
 
         cls.__container_types[type_name] = container_type
+        previous_type = cls.mime_type_map.get(mime_type)
         cls.mime_type_map[mime_type] = container_type
+        # A class uses the first of its MIME types in mime_type_map, like the reverse lookup used to do. If the MIME
+        # type was re-registered for a different class, the class that had it before may need to use another one.
+        for changed_type in (previous_type, container_type):
+            if changed_type is None:
+                continue
+            mime_type_name = next((name for name, mapped_type in cls.mime_type_map.items() if mapped_type == changed_type), None)
+            if mime_type_name is None:
+                cls._class_to_mime_name.pop(changed_type, None)
+            else:
+                cls._class_to_mime_name[changed_type] = mime_type_name
+        cls._mime_type_cache.clear()
 
     @classmethod
     def getMimeTypeForContainer(cls, container_type: type) -> Optional[MimeType]:
@@ -740,13 +843,16 @@ class ContainerRegistry(ContainerRegistryInterface):
         :return: A MimeType object that matches the mime type of the container or None if not found.
         """
 
-        try:
-            mime_type_name = UM.Dictionary.findKey(cls.mime_type_map, container_type)
-            if mime_type_name:
-                return MimeTypeDatabase.getMimeType(mime_type_name)
-        except ValueError:
+        if container_type in cls._mime_type_cache:
+            return cls._mime_type_cache[container_type]
+
+        mime_type_name = cls._class_to_mime_name.get(container_type)
+        if mime_type_name is None:
             Logger.log("w", "Unable to find mimetype for container %s", container_type)
-        return None
+            return None
+        mime_type = MimeTypeDatabase.getMimeType(mime_type_name)
+        cls._mime_type_cache[container_type] = mime_type
+        return mime_type
 
     @classmethod
     def getContainerForMimeType(cls, mime_type: MimeType) -> Optional[Type[ContainerInterface]]:
@@ -786,11 +892,31 @@ class ContainerRegistry(ContainerRegistryInterface):
 
         # Lock file for "more" atomically loading and saving to/from config dir.
         with self.lockFile():
-            for instance in self.findDirtyContainers(container_type = InstanceContainer):
-                self.saveContainer(instance)
+            # The containers tell us when they become dirty, so only those need to be checked.
+            dirty_containers = []  # type: List[ContainerInterface]
+            for container_id in list(self._dirty_ids):
+                container = self._containers.get(container_id)
+                if isinstance(container, (InstanceContainer, ContainerStack)) and container.isDirty():
+                    dirty_containers.append(container)
+                else:
+                    self._dirty_ids.discard(container_id)  # It got saved or removed in the meantime, or can't be saved.
+            if not dirty_containers:
+                return  # Nothing to save, so no need to know where to save it either.
 
-            for stack in self.findContainerStacks():
-                self.saveContainer(stack)
+            provider = self.getDefaultSaveProvider()
+            if not hasattr(provider, "saveContainers"):  # The provider can't save them all at once, so save them one by one.
+                for container in dirty_containers:
+                    self.saveContainer(container, provider)
+                return
+
+            # Saving them all at once allows the provider to write all files in one go, which is much faster.
+            failed_containers = provider.saveContainers(dirty_containers)  # type: ignore
+            failed_ids = {id(container) for container in failed_containers}
+            for container in dirty_containers:
+                if id(container) in failed_ids:  # Keep it dirty so that it gets saved with the next attempt.
+                    continue
+                container.setDirty(False)
+                self.source_provider[container.getId()] = provider
 
     # Clear the internal query cache
     def _clearQueryCache(self, *args: Any, **kwargs: Any) -> None:
@@ -802,17 +928,15 @@ class ContainerRegistry(ContainerRegistryInterface):
         are cleared.
         """
 
-        # Remove all case-insensitive matches since we won't find those with the below "<=" subset check.
-        # TODO: Properly check case-insensitively in the dict's values.
-        for key in list(ContainerQuery.ContainerQuery.cache):
-            if not key[0]:
-                del ContainerQuery.ContainerQuery.cache[key]
-
-        # Remove all cache items that this container could fall in.
-        for key in list(ContainerQuery.ContainerQuery.cache):
-            query_metadata = dict(zip(key[1::2], key[2::2]))
-            if query_metadata.items() <= container.getMetaData().items():
-                del ContainerQuery.ContainerQuery.cache[key]
+        # Queries filter on the container type in the metadata, so that's what decides which caches are affected.
+        container_class = container.getMetaData().get("container_type", type(container))
+        for container_type, cache in ContainerQuery.ContainerQuery.cache.items():
+            try:
+                is_affected = container_type is None or issubclass(container_class, container_type)
+            except TypeError:  # Not filtering on a proper class, so we can't tell. Better clear it.
+                is_affected = True
+            if is_affected:
+                cache.clear()
 
     def _onContainerMetaDataChanged(self, *args: ContainerInterface, **kwargs: Any) -> None:
         """Called when any container's metadata changed.
@@ -882,6 +1006,11 @@ class ContainerRegistry(ContainerRegistryInterface):
         "application/x-uranium-extruderstack": ContainerStack
     }  # type: Dict[str, Type[ContainerInterface]]
 
+    # Reverse of mime_type_map, to find the MIME type of a container class without scanning. The first MIME type in the
+    # map wins for classes that have multiple MIME types.
+    _class_to_mime_name = {container_type: mime_type for mime_type, container_type in reversed(list(mime_type_map.items()))}  # type: Dict[type, str]
+    _mime_type_cache = {}  # type: Dict[type, MimeType]  # MIME type objects found by getMimeTypeForContainer, per container class.
+
     __instance = None  # type: ContainerRegistry
 
     @classmethod
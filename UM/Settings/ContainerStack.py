@@ -121,7 +121,7 @@ class ContainerStack(QObject, ContainerInterface, PluginObject):
 
         if name != self.getName():
             self._metadata["name"] = name
-            self._dirty = True
+            self._setDirty(True)
             self.nameChanged.emit()
             self.metaDataChanged.emit(self)
 
@@ -197,7 +197,7 @@ class ContainerStack(QObject, ContainerInterface, PluginObject):
     def setMetaDataEntry(self, key: str, value: Any) -> None:
         if key not in self._metadata or self._metadata[key] != value:
             self._metadata[key] = value
-            self._dirty = True
+            self._setDirty(True)
             self.metaDataChanged.emit(self)
 
     def removeMetaDataEntry(self, key: str) -> None:
@@ -209,7 +209,17 @@ class ContainerStack(QObject, ContainerInterface, PluginObject):
         return self._dirty
 
     def setDirty(self, dirty: bool) -> None:
+        self._setDirty(dirty)
+
+    def _setDirty(self, dirty: bool) -> None:
+        """Change whether this stack is dirty, and let the registry know so it can find the dirty containers without
+        checking all of them."""
+
         self._dirty = dirty
+        if dirty:
+            _containerRegistry.markDirty(self)
+        else:
+            _containerRegistry.markClean(self)
 
     containersChanged = Signal()
 
@@ -448,6 +458,7 @@ class ContainerStack(QObject, ContainerInterface, PluginObject):
 
         ## TODO; Deserialize the containers.
 
+        self.metaDataChanged.emit(self)  # In case this stack was re-used. The registry needs to know about the new metadata dictionary.
         return serialized
 
     @classmethod
@@ -646,7 +657,7 @@ class ContainerStack(QObject, ContainerInterface, PluginObject):
         container.propertyChanged.connect(self._collectPropertyChanges)
         self._containers.insert(index, container)
         self.containersChanged.emit(container)
-        self._dirty = True
+        self._setDirty(True)
 
     def replaceContainer(self, index: int, container: ContainerInterface, postpone_emit: bool = False) -> None:
         """Replace a container in the stack.
@@ -667,7 +678,7 @@ class ContainerStack(QObject, ContainerInterface, PluginObject):
         self._containers[index].propertyChanged.disconnect(self._collectPropertyChanges)
         container.propertyChanged.connect(self._collectPropertyChanges)
         self._containers[index] = container
-        self._dirty = True
+        self._setDirty(True)
         if postpone_emit:
             # send it using sendPostponedEmits
             self._postponed_emits.append((self.containersChanged, container))
@@ -686,7 +697,7 @@ class ContainerStack(QObject, ContainerInterface, PluginObject):
             raise IndexError
         try:
             container = self._containers[index]
-            self._dirty = True
+            self._setDirty(True)
             container.propertyChanged.disconnect(self._collectPropertyChanges)
             del self._containers[index]
             self.containersChanged.emit(container)
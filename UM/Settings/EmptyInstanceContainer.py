@@ -10,6 +10,9 @@ if TYPE_CHECKING:
     from UM.Settings.Interfaces import ContainerInterface
     from UM.Settings.PropertyEvaluationContext import PropertyEvaluationContext
 
+# The serialized form of an empty container never changes, so only build it once.
+_EMPTY_SERIALIZED = "[general]\n version = " + str(InstanceContainer.Version) + "\n name = empty\n definition = fdmprinter\n"
+
 
 #
 # Represents an empty instance container which is not allowed to store any
@@ -29,4 +32,4 @@ class EmptyInstanceContainer(InstanceContainer):
         return ""  # FIXME: not sure if this is correct
 
     def serialize(self, ignored_metadata_keys: Optional[Set[str]] = None) -> str:
-        return "[general]\n version = " + str(InstanceContainer.Version) + "\n name = empty\n definition = fdmprinter\n"
+        return _EMPTY_SERIALIZED
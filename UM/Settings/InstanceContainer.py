@@ -92,7 +92,7 @@ class InstanceContainer(QObject, ContainerInterface, PluginObject):
             instance._container = new_container
             instance.propertyChanged.connect(new_container.propertyChanged)
         new_container._read_only = self._read_only
-        new_container._dirty = self._dirty
+        new_container._setDirty(self._dirty)
         new_container._path = cast(str, copy.deepcopy(self._path, memo))
         new_container._cached_values = cast(Optional[Dict[str, Any]], copy.deepcopy(self._cached_values, memo))
         return new_container
@@ -191,7 +191,7 @@ class InstanceContainer(QObject, ContainerInterface, PluginObject):
     def setName(self, name: str) -> None:
         if name != self.getName():
             self._metadata["name"] = name
-            self._dirty = True
+            self._setDirty(True)
             self.nameChanged.emit()
             self.pyqtNameChanged.emit()
             self.metaDataChanged.emit(self)
@@ -239,7 +239,7 @@ class InstanceContainer(QObject, ContainerInterface, PluginObject):
             "container_type": InstanceContainer
         }
         self._metadata.update(metadata)
-        self._dirty = True
+        self._setDirty(True)
         self.metaDataChanged.emit(self)
 
     metaDataChanged = pyqtSignal(QObject)
@@ -264,7 +264,7 @@ class InstanceContainer(QObject, ContainerInterface, PluginObject):
 
         if key not in self._metadata or self._metadata[key] != value:
             self._metadata[key] = value
-            self._dirty = True
+            self._setDirty(True)
             self.metaDataChanged.emit(self)
 
     def isDirty(self) -> bool:
@@ -276,7 +276,17 @@ class InstanceContainer(QObject, ContainerInterface, PluginObject):
         if self._read_only:
             Logger.log("w", "Tried to set dirty on read-only object.")
         else:
-            self._dirty = dirty
+            self._setDirty(dirty)
+
+    def _setDirty(self, dirty: bool) -> None:
+        """Change whether this container is dirty, and let the registry know so it can find the dirty containers
+        without checking all of them."""
+
+        self._dirty = dirty
+        if dirty:
+            _containerRegistry.markDirty(self)
+        else:
+            _containerRegistry.markClean(self)
 
     def getProperty(self, key: str, property_name: str, context: PropertyEvaluationContext = None) -> Any:
         """:copydoc ContainerInterface::getProperty
@@ -439,7 +449,7 @@ class InstanceContainer(QObject, ContainerInterface, PluginObject):
 
                 new_container.setProperty(instance.definition.key, property_name, getattr(instance, property_name))
 
-        new_container._dirty = True
+        new_container._setDirty(True)
         new_container._read_only = False
         return new_container
 
@@ -594,7 +604,7 @@ class InstanceContainer(QObject, ContainerInterface, PluginObject):
         if "values" in parser:
             self._cached_values = dict(parser["values"])
 
-        self._dirty = False
+        self._setDirty(False)
 
         return serialized
 
@@ -708,7 +718,7 @@ class InstanceContainer(QObject, ContainerInterface, PluginObject):
                 if instance.definition.dependsOnProperty(property_name) == "value":
                     self.propertyChanged.emit(key, property_name)
 
-        self._dirty = True
+        self._setDirty(True)
 
         instance.updateRelations(self)
 
@@ -723,7 +733,7 @@ class InstanceContainer(QObject, ContainerInterface, PluginObject):
             for property_name in instance.definition.getPropertyNames():
                 if instance.definition.dependsOnProperty(property_name) == "value":
                     self.propertyChanged.emit(key, property_name)
-        self._dirty = True
+        self._setDirty(True)
 
     def getDefinition(self) -> DefinitionContainerInterface:
         """Get the DefinitionContainer used for new instance creation."""
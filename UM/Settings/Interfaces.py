@@ -51,6 +51,11 @@ class ContainerInterface:
         This returns a dictionary containing all the metadata for this container.
         How this metadata is used depends on the application.
 
+        This should be the container's own dictionary, not a copy. The container
+        registry keeps a reference to it instead of a copy of its own. If the
+        dictionary is ever replaced by a new one, the metaDataChanged signal must
+        be emitted so that the registry can pick up the new dictionary.
+
         :return: The metadata for this container.
         """
 
@@ -202,9 +207,24 @@ class ContainerInterface:
         pass
 
     def isDirty(self) -> bool:
+        """Whether this container has changes that still need to be saved.
+
+        The container registry only saves the containers that it was told became dirty (see setDirty), so this alone
+        isn't enough to get a container saved after it was added to the registry.
+        """
+
         pass
 
     def setDirty(self, dirty: bool) -> None:
+        """Change whether this container has changes that still need to be saved.
+
+        Implementations must call ContainerRegistryInterface.markDirty or markClean on the registry whenever the
+        dirty state changes, including when it changes without calling this method. InstanceContainer and
+        ContainerStack do this in _setDirty, so subclasses should change the dirty state only through setDirty or
+        _setDirty, and never by assigning _dirty directly. Otherwise the container isn't saved when it becomes dirty
+        after it was added to the registry.
+        """
+
         pass
 
     propertyChanged = None   # type: Signal
@@ -249,3 +269,16 @@ class ContainerRegistryInterface:
 
     def isExplicitReadOnly(self, container_id: str) -> bool:
         raise NotImplementedError()
+
+    def markDirty(self, container: ContainerInterface) -> None:
+        """Called by containers when they become dirty, so that the registry knows which ones to save.
+
+        Registries that don't keep track of dirty containers don't need to do anything here.
+        """
+
+        pass
+
+    def markClean(self, container: ContainerInterface) -> None:
+        """Called by containers when they are no longer dirty, for instance because they were saved."""
+
+        pass
@@ -1,11 +1,12 @@
 # Copyright (c) 2022 Ultimaker B.V.
 # Uranium is released under the terms of the LGPLv3 or higher.
 
+import concurrent.futures  # To read metadata files in parallel.
 import os  # For getting the IDs from a filename.
 import pickle  # For caching definitions.
 import re  # To detect back-up files in the ".../old/#/..." folders.
 import urllib.parse  # For interpreting escape characters using unquote_plus.
-from typing import Any, Dict, Iterable, Optional, Set, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
 from UM.Application import Application  # To get the current version for finding the cache directory.
 from UM.ConfigurationErrorMessage import ConfigurationErrorMessage
@@ -13,7 +14,7 @@ from UM.Logger import Logger
 from UM.MimeTypeDatabase import MimeTypeDatabase, MimeType  # To get the type of container we're loading.
 from UM.Platform import Platform
 from UM.Resources import Resources
-from UM.SaveFile import SaveFile
+from UM.SaveFile import SaveFile, saveFiles
 from UM.Settings.ContainerProvider import ContainerProvider  # The class we're implementing.
 from UM.Settings.ContainerRegistry import ContainerRegistry  # To get the resource types for containers.
 from UM.Settings.DefinitionContainer import DefinitionContainer  # To check if we need to cache this container.
@@ -27,6 +28,13 @@ if MYPY:  # Things to import for type checking only.
 class LocalContainerProvider(ContainerProvider):
     """Provides containers from the local installation."""
 
+    # Version of the format of the definition cache files. It's stored as the first byte of the cache files so that
+    # caches from an incompatible version can be detected without unpickling them. Increment it when the format changes.
+    DefinitionCacheVersion = 1
+
+    # The maximum number of threads to read files with when prefetching metadata.
+    MaxPrefetchWorkers = min(32, (os.cpu_count() or 1) * 4)
+
     def __init__(self):
         """Creates the local container provider.
 
@@ -39,6 +47,8 @@ class LocalContainerProvider(ContainerProvider):
         self._id_to_mime = {}  # type: Dict[str, MimeType] #Translates container IDs to their MIME type.
 
         self._is_read_only_cache = {}  # type: Dict[str, bool]
+        self._quoted_ids = {}  # type: Dict[str, str] #Translates container IDs to their escaped form, as used in file names.
+        self._prefetched_files = {}  # type: Dict[str, str] #Contents of the files that prefetchMetadata already read, by container ID.
 
         self._storage_path = ""
 
@@ -90,49 +100,106 @@ class LocalContainerProvider(ContainerProvider):
     def saveContainer(self, container: "ContainerInterface") -> None:
         """Find out where to save a container and save it there"""
 
+        file = self._serializeForSaving(container)
+        if file is None:
+            return
+        path, data = file
+        try:
+            with SaveFile(path, "wt") as f:
+                f.write(data)
+        except OSError as e:
+            Logger.log("e", "Unable to store local container to path {path}: {err}".format(path = path, err = str(e)))
+            return
+        self._registerSavedContainer(container, path)
+
+    def saveContainers(self, containers: Iterable["ContainerInterface"]) -> List["ContainerInterface"]:
+        """Save a batch of containers at once.
+
+        This is faster than saving them one by one with saveContainer, since all
+        files can then be synced to disk together. Unlike saveContainer, this
+        doesn't lock the files, so the caller should hold the lock of the
+        container registry.
+
+        :return: The containers that were serialized but couldn't be written to
+        disk. They weren't saved.
+        """
+
+        files = []  # type: List[Tuple[ContainerInterface, str, str]]  # For each container that can be saved, the path and data to write.
+        for container in containers:
+            file = self._serializeForSaving(container)
+            if file is not None:
+                files.append((container, file[0], file[1]))
+
+        errors = saveFiles((path, data) for _, path, data in files)
+        failed_containers = []  # type: List[ContainerInterface]
+        for container, path, _ in files:
+            if path in errors:
+                Logger.log("e", "Unable to store local container to path {path}: {err}".format(path = path, err = str(errors[path])))
+                failed_containers.append(container)
+                continue
+            self._registerSavedContainer(container, path)
+        return failed_containers
+
+    def _serializeForSaving(self, container: "ContainerInterface") -> Optional[Tuple[str, str]]:
+        """Find out where to save a container and what to write there.
+
+        :return: The path to save the container to and its serialized data, or
+        ``None`` if it can't be saved.
+        """
+
         try:
             data = container.serialize()
         except NotImplementedError:
-            return
+            return None
         except Exception:
             Logger.logException("e", "An exception occurred when serializing container %s", container.getId())
-            return
+            return None
 
         mime_type = ContainerRegistry.getMimeTypeForContainer(type(container))
         if mime_type is None:
             Logger.log("w", "Failed to get MIME type for container type [%s]", type(container))
-            return
-        file_name = urllib.parse.quote_plus(container.getId()) + "." + mime_type.preferredSuffix
+            return None
+        file_name = self._quoteId(container.getId()) + "." + mime_type.preferredSuffix
         container_type = container.getMetaDataEntry("type")
         resource_types = ContainerRegistry.getInstance().getResourceTypes()
-        if container_type in resource_types:
-            path = Resources.getStoragePath(resource_types[container_type], file_name)
-            try:
-                with SaveFile(path, "wt") as f:
-                    f.write(data)
-            except OSError as e:
-                Logger.log("e", "Unable to store local container to path {path}: {err}".format(path = path, err = str(e)))
-                return
-            container.setPath(path)
-            # Register it internally as being saved
-            self._id_to_path[container.getId()] = path
-            mime = self._pathToMime(path)
-            if mime is not None:
-                self._id_to_mime[container.getId()] = mime
-            else:
-                Logger.log("e", "Failed to find MIME type for container ID [%s] with path [%s]", container.getId(), path)
-
-            base_file = container.getMetaData().get("base_file")
-            if base_file:
-                for container_md in ContainerRegistry.getInstance().findContainersMetadata(base_file = base_file):
-                    self._id_to_path[container_md["id"]] = path
-                    mime = self._pathToMime(path)
-                    if mime is not None:
-                        self._id_to_mime[container_md["id"]] = mime
-                    else:
-                        Logger.log("e", "Failed to find MIME type for container ID [%s] with path [%s]", container.getId(), path)
-        else:
+        if container_type not in resource_types:
             Logger.log("w", "Dirty container [%s] is not saved because the resource type is unknown in ContainerRegistry", container_type)
+            return None
+        return Resources.getStoragePath(resource_types[container_type], file_name), data
+
+    def _quoteId(self, container_id: str) -> str:
+        """Escape a container ID such that it can be used as file name.
+
+        The same containers get saved over and over again, so the result is cached. It's cached by ID rather than by
+        container, so a renamed container simply gets a new entry.
+        """
+
+        result = self._quoted_ids.get(container_id)
+        if result is None:
+            result = urllib.parse.quote_plus(container_id)
+            self._quoted_ids[container_id] = result
+        return result
+
+    def _registerSavedContainer(self, container: "ContainerInterface", path: str) -> None:
+        """Register internally that a container has been saved to a certain path."""
+
+        container.setPath(path)
+        self._id_to_path[container.getId()] = path
+        mime = self._pathToMime(path)
+        if mime is not None:
+            self._id_to_mime[container.getId()] = mime
+        else:
+            Logger.log("e", "Failed to find MIME type for container ID [%s] with path [%s]", container.getId(), path)
+
+        base_file = container.getMetaData().get("base_file")
+        if base_file:
+            for container_md in ContainerRegistry.getInstance().findContainersMetadata(base_file = base_file):
+                self._id_to_path[container_md["id"]] = path
+                mime = self._pathToMime(path)
+                if mime is not None:
+                    self._id_to_mime[container_md["id"]] = mime
+                else:
+                    Logger.log("e", "Failed to find MIME type for container ID [%s] with path [%s]", container.getId(), path)
 
     def loadMetadata(self, container_id: str) -> Dict[str, Any]:
         """Load the metadata of a specified container.
@@ -144,6 +211,7 @@ class LocalContainerProvider(ContainerProvider):
 
         registry = ContainerRegistry.getInstance()
         if container_id in registry.metadata:
+            self._prefetched_files.pop(container_id, None)
             return registry.metadata[container_id]
 
         filename = self._id_to_path[container_id]  # Raises KeyError if container ID does not exist in the (cache of the) files!
@@ -151,8 +219,11 @@ class LocalContainerProvider(ContainerProvider):
 
         requested_metadata = {}  # type: Dict[str, Any]
         try:
-            with open(filename, "r", encoding = "utf-8") as f:
-                result_metadatas = clazz.deserializeMetadata(f.read(), container_id) #pylint: disable=no-member
+            serialized = self._prefetched_files.pop(container_id, None)
+            if serialized is None:
+                with open(filename, "r", encoding = "utf-8") as f:
+                    serialized = f.read()
+            result_metadatas = clazz.deserializeMetadata(serialized, container_id) #pylint: disable=no-member
         except IOError as e:
             Logger.log("e", "Unable to load metadata from file {filename}: {error_msg}".format(filename = filename, error_msg = str(e)))
             ConfigurationErrorMessage.getInstance().addFaultyContainers(container_id)
@@ -176,6 +247,34 @@ class LocalContainerProvider(ContainerProvider):
                 registry.source_provider[metadata["id"]] = self
         return requested_metadata
 
+    def prefetchMetadata(self, container_ids: Iterable[str]) -> None:
+        """Read the files of all of these containers in parallel, since that's mostly waiting for the disk.
+
+        Only the reading happens in parallel. Deserializing the metadata still happens in loadMetadata, because that
+        may look up other containers in the registry.
+        """
+
+        paths = {container_id: self._id_to_path[container_id] for container_id in container_ids if container_id in self._id_to_path}
+        if not paths:
+            return
+        with concurrent.futures.ThreadPoolExecutor(max_workers = self.MaxPrefetchWorkers) as executor:
+            contents = executor.map(self._readFile, paths.values())
+            self._prefetched_files = {container_id: serialized for container_id, serialized in zip(paths.keys(), contents) if serialized is not None}
+
+    @staticmethod
+    def _readFile(path: str) -> Optional[str]:
+        """Read a text file, or return ``None`` if it can't be read.
+
+        This is called from other threads, so it mustn't touch anything else. If it fails, loadMetadata tries again and
+        reports the problem.
+        """
+
+        try:
+            with open(path, "r", encoding = "utf-8") as f:
+                return f.read()
+        except Exception:
+            return None
+
     def isReadOnly(self, container_id: str) -> bool:
         """Returns whether a container is read-only or not.
 
@@ -215,6 +314,7 @@ class LocalContainerProvider(ContainerProvider):
         path_to_delete = self._id_to_path[container_id]
         del self._id_to_path[container_id]
         del self._id_to_mime[container_id]
+        self._quoted_ids.pop(container_id, None)
 
         # Remove file related to a container
         #
@@ -256,6 +356,9 @@ class LocalContainerProvider(ContainerProvider):
 
         try:
             with open(cache_path, "rb") as f:
+                if f.read(1) != bytes((self.DefinitionCacheVersion, )):
+                    Logger.log("d", "The cache of definition {definition_id} has a different format. Ignoring cached version.".format(definition_id = definition_id))
+                    return None
                 # The DefinitionContainerUnpickler has a list of whitelisted globals
                 definition = DefinitionContainerUnpickler(f).load()
         except (OSError, PermissionError, IOError, AttributeError, EOFError, ImportError, IndexError, pickle.UnpicklingError) as e:
@@ -290,20 +393,25 @@ class LocalContainerProvider(ContainerProvider):
             return  # No rights to save it. Better give up.
 
         try:
-            with open(cache_path, "wb") as f:
-                pickle.dump(definition, f, pickle.HIGHEST_PROTOCOL)
+            # Pickle in memory first, so that a failure to pickle can never leave a half-complete cache file behind.
+            data = bytes((self.DefinitionCacheVersion, )) + pickle.dumps(definition, pickle.HIGHEST_PROTOCOL)
         except RecursionError:
             # Sometimes a recursion error in pickling occurs here.
             # The cause is unknown. It must be some circular reference in the definition instances or definition containers.
-            # Instead of saving a partial cache and raising an exception, simply fail to save the cache.
+            # Instead of raising an exception, simply fail to save the cache.
             # See CURA-4024.
             Logger.log("w", "The definition cache for definition {definition_id} failed to pickle.".format(definition_id = definition.getId()))
             if os.path.exists(cache_path):
                 try:
-                    os.remove(cache_path)  # The pickling might be half-complete, which causes EOFError in Pickle when you load it later.
+                    os.remove(cache_path)  # Any older cache is outdated by now.
                 except PermissionError:
                     # Someone else is touching this file.
                     Logger.log("w", "Unable to remove picked file as another process has access to it %s", cache_path)
+            return
+
+        try:
+            with open(cache_path, "wb") as f:
+                f.write(data)
         except PermissionError:
             Logger.log("w", "Cura didn't get permission to save the definition {definition_id}".format(definition_id = definition.getId()))
 
@@ -0,0 +1,191 @@
+# Copyright (c) 2022 Ultimaker B.V.
+# Uranium is released under the terms of the LGPLv3 or higher.
+
+import os
+import pickle
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from LocalContainerProvider import LocalContainerProvider
+
+from UM.MimeTypeDatabase import MimeType, MimeTypeDatabase
+from UM.Resources import Resources
+from UM.Settings.ContainerRegistry import ContainerRegistry
+import UM.Settings.ContainerStack
+from UM.Settings.ContainerStack import ContainerStack
+from UM.Settings.DefinitionContainer import DefinitionContainer
+
+
+class MetadataListContainer:
+    """Container type whose serialized form is simply a list of container IDs, one per line.
+
+    All IDs after the first are side-loaded, like with a material file containing multiple materials.
+    """
+
+    @classmethod
+    def deserializeMetadata(cls, serialized, container_id):
+        return [{"id": line, "name": line, "serialized": serialized} for line in serialized.splitlines()]
+
+
+@pytest.fixture
+def container_registry():
+    MimeTypeDatabase.addMimeType(
+        MimeType(
+            name = "application/x-uranium-containerstack",
+            comment = "Uranium Container Stack",
+            suffixes = ["stack.cfg"]
+        )
+    )
+
+    ContainerRegistry._ContainerRegistry__instance = None  # Reset the private instance variable every time.
+    registry = ContainerRegistry(MagicMock())
+    registry.addResourceType(Resources.ContainerStacks, "test_stack")
+    UM.Settings.ContainerStack.setContainerRegistry(registry)
+    return registry
+
+
+@pytest.fixture
+def provider(container_registry):
+    result = LocalContainerProvider()
+    result._id_to_path = {}  # Don't look for containers in the resource folders.
+    return result
+
+
+def addMetadataListFile(provider, directory, file_name, contents, container_ids):
+    path = os.path.join(str(directory), file_name)
+    if contents is not None:
+        with open(path, "w", encoding = "utf-8") as f:
+            f.write(contents)
+    mime_type = MimeType(name = "application/x-test-metadatalist", comment = "Test Metadata List", suffixes = ["list"])
+    for container_id in container_ids:
+        provider._id_to_path[container_id] = path
+        provider._id_to_mime[container_id] = mime_type
+    return path
+
+
+def test_prefetchMetadata(provider, tmpdir):
+    path = addMetadataListFile(provider, tmpdir, "prefetched.list", "prefetched", ["prefetched"])
+
+    provider.prefetchMetadata(["prefetched"])
+    assert provider._prefetched_files == {"prefetched": "prefetched"}
+    os.remove(path)  # From now on, only the prefetched contents are available.
+
+    with patch.dict(ContainerRegistry.mime_type_map, {"application/x-test-metadatalist": MetadataListContainer}):
+        metadata = provider.loadMetadata("prefetched")
+
+    assert metadata["id"] == "prefetched"
+    assert metadata["serialized"] == "prefetched"
+    assert provider._prefetched_files == {}  # Used only once.
+
+
+def test_prefetchMetadataFailedRead(provider, tmpdir):
+    path = addMetadataListFile(provider, tmpdir, "late.list", None, ["late"])  # The file isn't there yet while prefetching.
+
+    provider.prefetchMetadata(["late"])
+    assert provider._prefetched_files == {}
+    with open(path, "w", encoding = "utf-8") as f:
+        f.write("late")
+
+    with patch.dict(ContainerRegistry.mime_type_map, {"application/x-test-metadatalist": MetadataListContainer}):
+        metadata = provider.loadMetadata("late")
+
+    assert metadata["id"] == "late"  # Read again, this time successfully.
+
+
+def test_prefetchMetadataSideLoaded(container_registry, provider, tmpdir):
+    addMetadataListFile(provider, tmpdir, "siblings.list", "first\nsecond", ["first", "second"])
+
+    provider.prefetchMetadata(["first", "second"])
+    with patch.dict(ContainerRegistry.mime_type_map, {"application/x-test-metadatalist": MetadataListContainer}):
+        provider.loadMetadata("first")
+        assert "second" in container_registry.metadata  # Side-loaded along with the first one.
+        assert container_registry.metadata["second"] is provider.loadMetadata("second")
+
+    assert provider._prefetched_files == {}  # The side-loaded container didn't need its prefetched contents.
+
+
+def test_saveContainers(container_registry, provider, tmpdir):
+    saved_stack = ContainerStack("saved_stack")
+    saved_stack.setMetaDataEntry("type", "test_stack")
+    unknown_stack = ContainerStack("unknown_stack")
+    unknown_stack.setMetaDataEntry("type", "unknown_type")  # Not a resource type known to the registry, so it can't be saved.
+
+    with patch("UM.Resources.Resources.getStoragePath", MagicMock(side_effect = lambda resource_type, file_name: os.path.join(str(tmpdir), file_name))):
+        failed_containers = provider.saveContainers([saved_stack, unknown_stack])
+
+    assert failed_containers == []  # Skipped containers weren't attempted, so they didn't fail.
+    saved_path = os.path.join(str(tmpdir), "saved_stack.stack.cfg")
+    assert os.path.isfile(saved_path)
+    assert saved_stack.getPath() == saved_path
+    assert provider._id_to_path["saved_stack"] == saved_path
+    assert "unknown_stack" not in provider._id_to_path
+    assert sorted(os.listdir(str(tmpdir))) == ["saved_stack.stack.cfg"]
+
+
+def test_saveContainersFailed(provider, tmpdir):
+    stack = ContainerStack("unwritable_stack")
+    stack.setMetaDataEntry("type", "test_stack")
+    missing_directory = os.path.join(str(tmpdir), "does_not_exist")
+
+    with patch("UM.Resources.Resources.getStoragePath", MagicMock(side_effect = lambda resource_type, file_name: os.path.join(missing_directory, file_name))):
+        failed_containers = provider.saveContainers([stack])
+
+    assert failed_containers == [stack]
+    assert "unwritable_stack" not in provider._id_to_path
+
+
+def test_quotedIdCache(provider, tmpdir):
+    stack = ContainerStack("some stack/with slash")
+    stack.setMetaDataEntry("type", "test_stack")
+
+    with patch("UM.Resources.Resources.getStoragePath", MagicMock(side_effect = lambda resource_type, file_name: os.path.join(str(tmpdir), file_name))):
+        provider.saveContainers([stack])
+
+    assert provider._quoted_ids == {"some stack/with slash": "some+stack%2Fwith+slash"}
+    saved_path = os.path.join(str(tmpdir), "some+stack%2Fwith+slash.stack.cfg")
+    assert provider._id_to_path["some stack/with slash"] == saved_path
+
+    provider.removeContainer("some stack/with slash")
+    assert provider._quoted_ids == {}
+    assert not os.path.exists(saved_path)
+
+
+@pytest.fixture
+def cached_definition_path(provider, tmpdir):
+    definition_path = os.path.join(str(tmpdir), "cached_definition.def.json")
+    with open(definition_path, "w", encoding = "utf-8") as f:
+        f.write("{}")
+    os.utime(definition_path, (0, 0))  # Make sure that the cache is newer.
+    provider._id_to_path["cached_definition"] = definition_path
+
+    cache_path = os.path.join(str(tmpdir), "cache", "cached_definition")
+    with patch("UM.Resources.Resources.getStoragePath", MagicMock(return_value = cache_path)):
+        with patch("UM.Resources.Resources.getPath", MagicMock(return_value = cache_path)):
+            with patch("UM.Application.Application.getInstance", MagicMock()):
+                yield cache_path
+
+
+def test_definitionCacheRoundtrip(provider, cached_definition_path):
+    definition = DefinitionContainer("cached_definition")
+    definition.getMetaData()["name"] = "Cached Definition"
+
+    provider._saveCachedDefinition(definition)
+    with open(cached_definition_path, "rb") as f:
+        assert f.read(1) == bytes((LocalContainerProvider.DefinitionCacheVersion, ))
+    result = provider._loadCachedDefinition("cached_definition")
+
+    assert result is not None
+    assert result.getId() == "cached_definition"
+    assert result.getName() == "Cached Definition"
+
+
+def test_definitionCacheWithoutVersion(provider, cached_definition_path):
+    # Older releases stored just the pickled definition, without a version in front.
+    os.makedirs(os.path.dirname(cached_definition_path))
+    with open(cached_definition_path, "wb") as f:
+        pickle.dump(DefinitionContainer("cached_definition"), f, pickle.HIGHEST_PROTOCOL)
+
+    assert provider._loadCachedDefinition("cached_definition") is None
@@ -4,10 +4,11 @@
 import unittest
 import os.path
 import tempfile
+from unittest.mock import patch
 
 from multiprocessing import Pool
 
-from UM.SaveFile import SaveFile
+from UM.SaveFile import SaveFile, saveFiles
 
 write_count = 0
 
@@ -48,5 +49,51 @@ class TestSaveFile(unittest.TestCase):
             self.assertEqual(len(data), 9)
             self.assertEqual(data, "test file")
 
+    def test_saveFiles(self):
+        first_path = os.path.join(self._temp_dir.name, "first")
+        second_path = os.path.join(self._temp_dir.name, "second")
+        with open(second_path, "w", encoding = "utf-8") as f:
+            f.write("old contents")
+        impossible_path = os.path.join(self._temp_dir.name, "does_not_exist", "impossible")
+
+        errors = saveFiles([(first_path, "first file"), (second_path, "second file"), (impossible_path, "won't be written")])
+
+        self.assertEqual(list(errors.keys()), [impossible_path])
+        with open(first_path, encoding = "utf-8") as f:
+            self.assertEqual(f.read(), "first file")
+        with open(second_path, encoding = "utf-8") as f:
+            self.assertEqual(f.read(), "second file")
+        # No temporary files should be left behind.
+        self.assertEqual(sorted(os.listdir(self._temp_dir.name)), ["first", "second"])
+
+    def test_saveFilesSyncsWritableFile(self):
+        path = os.path.join(self._temp_dir.name, "synced")
+
+        # Syncing requires write access on Windows. Writing nothing fails the same way on every platform if the file isn't writable.
+        with patch("UM.SaveFile.fsync", side_effect = lambda fd: os.write(fd, b"")):
+            errors = saveFiles([(path, "synced file")])
+
+        self.assertEqual(errors, {})
+        with open(path, encoding = "utf-8") as f:
+            self.assertEqual(f.read(), "synced file")
+
+    def test_saveFilesRetriesReplace(self):
+        path = os.path.join(self._temp_dir.name, "busy")
+        replace = os.replace
+        attempts = []
+        def busyReplace(source, destination):  # Like on Windows, when another process still has the file open.
+            attempts.append(destination)
+            if len(attempts) < 3:
+                raise PermissionError("The file is being used by another process.")
+            replace(source, destination)
+
+        with patch("os.replace", side_effect = busyReplace):
+            errors = saveFiles([(path, "busy file")])
+
+        self.assertEqual(errors, {})
+        self.assertEqual(len(attempts), 3)
+        with open(path, encoding = "utf-8") as f:
+            self.assertEqual(f.read(), "busy file")
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,6 +1,8 @@
 # Copyright (c) 2018 Ultimaker B.V.
 # Uranium is released under the terms of the LGPLv3 or higher.
 
+from unittest.mock import MagicMock, patch
+
 import pytest
 
 from UM.Settings.ContainerQuery import ContainerQuery
@@ -46,3 +48,18 @@ def test_matchMultipleTokens():
             assert result is not None
         else:
             assert result is None
+
+
+def test_cacheEvictsLeastRecentlyUsed():
+    registry = MagicMock()
+    registry.metadata = {"a": {"id": "a", "name": "test"}, "b": {"id": "b", "name": "other"}}
+
+    ContainerQuery.cache.clear()
+    with patch.object(ContainerQuery, "MaxQueryCacheSize", 2):
+        ContainerQuery(registry, name = "test").execute()
+        ContainerQuery(registry, name = "other").execute()
+        ContainerQuery(registry, name = "test").execute()  # Cache hit, so this becomes the most recently used query.
+        ContainerQuery(registry, name = "nothing").execute()  # The cache is full, so this evicts the "other" query.
+
+        assert list(ContainerQuery.cache[None].keys()) == [(False, "name", "test"), (False, "name", "nothing")]
+    ContainerQuery.cache.clear()
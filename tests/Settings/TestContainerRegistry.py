@@ -2,11 +2,12 @@
 # Uranium is released under the terms of the LGPLv3 or higher.
 
 import os
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 import pytest
 
 from UM.Resources import Resources
+from UM.Settings.ContainerRegistry import ContainerRegistry
 from UM.Settings.DefinitionContainer import DefinitionContainer
 from UM.Settings.InstanceContainer import InstanceContainer
 from UM.Settings.ContainerStack import ContainerStack
@@ -52,6 +53,37 @@ def test_addContainer(container_registry):
     assert instance_container_1.getMetaData() not in container_registry.findDefinitionContainersMetadata()
     assert instance_container_1 not in container_registry.findDefinitionContainers()
 
+##  Tests that adding a container doesn't need to query the registry to find out
+#   whether it was already added.
+def test_addContainerDoesNotQuery(container_registry):
+    container_registry.findContainers = MagicMock()
+    container_registry.findContainersMetadata = MagicMock()
+
+    test_container = InstanceContainer("omgzomg")
+    assert container_registry.addContainer(test_container)
+    assert container_registry.addContainer(test_container)  # Already there, which is fine too.
+
+    container_registry.findContainers.assert_not_called()
+    container_registry.findContainersMetadata.assert_not_called()
+
+
+##  Tests that adding a container only clears the query caches of the types of
+#   containers that it could show up in.
+def test_clearQueryCacheByContainer(container_registry):
+    from UM.Settings.ContainerQuery import ContainerQuery
+    ContainerQuery.cache.clear()
+
+    container_registry.addContainer(DefinitionContainer("some_definition"))
+    definitions_before = container_registry.findDefinitionContainersMetadata()
+    instances_before = container_registry.findInstanceContainersMetadata()
+    container_registry.addContainer(InstanceContainer("new_instance"))
+
+    assert ContainerQuery.cache[DefinitionContainer]  # The definition queries can't include the new instance, so they are still cached.
+    assert not ContainerQuery.cache[InstanceContainer]
+    assert container_registry.findDefinitionContainersMetadata() == definitions_before
+    assert len(container_registry.findInstanceContainersMetadata()) == len(instances_before) + 1
+
+
 ##  Tests adding a container type to the registry.
 #
 #   This adds the path to this file to the search paths for plug-ins, then lets
@@ -152,6 +184,28 @@ def test_renameContainer(container_registry):
     assert "omgzomg" not in [container.getId() for container in container_registry.findDirtyContainers()]
 
 
+def test_registryMetadataFollowsDeserializedStack(container_registry):
+    stack = ContainerStack("some_stack")
+    container_registry.addContainer(stack)
+
+    # Re-using the stack replaces its metadata dictionary, which the registry should pick up.
+    stack.deserialize("[general]\nversion = {version}\nname = Some Stack\nid = some_stack\n\n[metadata]\nfoo = bar\n".format(version = ContainerStack.Version))
+    assert container_registry.metadata["some_stack"] is stack.getMetaData()
+    assert container_registry.findContainerStacksMetadata(foo = "bar") == [stack.getMetaData()]
+
+
+def test_registryMetadataFollowsDeserializedLoadedStack(container_registry, test_containers_provider):
+    stack = ContainerStack("loaded_stack")
+    test_containers_provider._containers["loaded_stack"] = stack
+    test_containers_provider.addMetadata(stack.getMetaData())
+    container_registry.load()
+
+    # Containers from load() must be followed just like the ones from addContainer().
+    stack.deserialize("[general]\nversion = {version}\nname = Loaded Stack\nid = loaded_stack\n\n[metadata]\nfoo = bar\n".format(version = ContainerStack.Version))
+    assert container_registry.metadata["loaded_stack"] is stack.getMetaData()
+    assert container_registry.findContainerStacksMetadata(foo = "bar") == [stack.getMetaData()]
+
+
 ##  Tests the creation of the container registry.
 #
 #   This is tested using the fixture to create a container registry.
@@ -330,6 +384,45 @@ def test_getMimeTypeForContainer(container_registry):
     assert container_registry.getContainerForMimeType(mimetype) == InstanceContainer
 
 
+def test_getMimeTypeForContainerIsCached(container_registry):
+    # These are class-wide, so restore them afterwards. That way neither the registered type nor the mocked MIME type leaks into other tests.
+    with patch.dict(ContainerRegistry._ContainerRegistry__container_types), patch.dict(ContainerRegistry.mime_type_map), patch.dict(ContainerRegistry._class_to_mime_name), patch.dict(ContainerRegistry._mime_type_cache):
+        container_registry._mime_type_cache.clear()  # It may still be filled from other tests.
+        with patch("UM.MimeTypeDatabase.MimeTypeDatabase.getMimeType", MagicMock(return_value = "the_mime_type")) as get_mime_type:
+            assert container_registry.getMimeTypeForContainer(InstanceContainer) == "the_mime_type"
+            assert container_registry.getMimeTypeForContainer(InstanceContainer) == "the_mime_type"
+            assert get_mime_type.call_count == 1
+
+            # Registering a new container type invalidates the cache.
+            container_registry.addContainerTypeByName(InstanceContainer, "instance", "application/x-uranium-instancecontainer")
+            container_registry.getMimeTypeForContainer(InstanceContainer)
+            assert get_mime_type.call_count == 2
+
+
+def test_addContainerTypeByNameReplacesMimeType():
+    class OldContainer:
+        pass
+    class NewContainer:
+        pass
+
+    # These are class-wide, so restore them afterwards.
+    with patch.dict(ContainerRegistry._ContainerRegistry__container_types), patch.dict(ContainerRegistry.mime_type_map), patch.dict(ContainerRegistry._class_to_mime_name), patch.dict(ContainerRegistry._mime_type_cache):
+        with patch("UM.MimeTypeDatabase.MimeTypeDatabase.getMimeType", MagicMock(side_effect = lambda mime_type_name: mime_type_name)):
+            ContainerRegistry.addContainerTypeByName(OldContainer, "old", "application/x-test-first")
+            ContainerRegistry.addContainerTypeByName(OldContainer, "old", "application/x-test-second")
+            assert ContainerRegistry.getMimeTypeForContainer(OldContainer) == "application/x-test-first"  # The first MIME type of a class is used.
+
+            # Taking the first MIME type away makes the old class use its next one.
+            ContainerRegistry.addContainerTypeByName(NewContainer, "new", "application/x-test-first")
+            assert ContainerRegistry.getMimeTypeForContainer(NewContainer) == "application/x-test-first"
+            assert ContainerRegistry.getMimeTypeForContainer(OldContainer) == "application/x-test-second"
+
+            # Once it has no MIME types left, it has no MIME type at all.
+            ContainerRegistry.addContainerTypeByName(NewContainer, "new", "application/x-test-second")
+            assert ContainerRegistry.getMimeTypeForContainer(NewContainer) == "application/x-test-first"
+            assert ContainerRegistry.getMimeTypeForContainer(OldContainer) is None
+
+
 def test_saveContainer(container_registry):
     mocked_provider = MagicMock()
     mocked_container = MagicMock()
@@ -342,6 +435,93 @@ def test_saveContainer(container_registry):
     container_registry.getDefaultSaveProvider().saveContainer.assert_called_once_with(mocked_container)
 
 
+def test_saveDirtyContainers(container_registry):
+    container_registry.getDefaultSaveProvider().saveContainers = MagicMock(return_value = [])
+
+    dirty_instance = InstanceContainer("dirty_instance")
+    dirty_instance.setDirty(True)
+    container_registry.addContainer(dirty_instance)
+    container_registry.addContainer(InstanceContainer("clean_instance"))
+    dirty_stack = ContainerStack("dirty_stack")
+    dirty_stack.setDirty(True)
+    container_registry.addContainer(dirty_stack)
+
+    container_registry.saveDirtyContainers()
+
+    container_registry.getDefaultSaveProvider().saveContainers.assert_called_once()
+    saved = container_registry.getDefaultSaveProvider().saveContainers.call_args[0][0]
+    assert len(saved) == 2
+    assert dirty_instance in saved
+    assert dirty_stack in saved
+    assert not dirty_instance.isDirty()
+
+
+def test_saveDirtyContainersNothingDirtyWithMultipleProviders(container_registry):
+    container_registry._providers.append(MagicMock())  # With multiple providers there is no default save provider.
+    container_registry.addContainer(InstanceContainer("clean_instance"))
+
+    container_registry.saveDirtyContainers()  # Nothing is dirty, so this shouldn't need a save provider.
+
+
+def test_saveDirtyContainersKeepsFailedDirty(container_registry):
+    saved_instance = InstanceContainer("saved_instance")
+    saved_instance.setDirty(True)
+    container_registry.addContainer(saved_instance)
+    failed_instance = InstanceContainer("failed_instance")
+    failed_instance.setDirty(True)
+    container_registry.addContainer(failed_instance)
+    container_registry.getDefaultSaveProvider().saveContainers = MagicMock(return_value = [failed_instance])
+
+    container_registry.saveDirtyContainers()
+
+    assert not saved_instance.isDirty()
+    assert failed_instance.isDirty()  # Needs to be saved again next time.
+
+
+def test_saveDirtyContainersChangedAfterAdding(container_registry):
+    container_registry.getDefaultSaveProvider().saveContainers = MagicMock(return_value = [])
+
+    changed_instance = InstanceContainer("changed_instance")
+    container_registry.addContainer(changed_instance)
+    changed_stack = ContainerStack("changed_stack")
+    container_registry.addContainer(changed_stack)
+    container_registry.addContainer(InstanceContainer("unchanged_instance"))
+
+    changed_instance.setMetaDataEntry("some_entry", "some_value")
+    changed_stack.setName("Changed Stack")
+    # A copy with the same ID that becomes clean doesn't make the original clean.
+    copy_instance = InstanceContainer("changed_instance")
+    copy_instance.setDirty(True)
+    copy_instance.setDirty(False)
+
+    container_registry.saveDirtyContainers()
+
+    saved = container_registry.getDefaultSaveProvider().saveContainers.call_args[0][0]
+    assert len(saved) == 2
+    assert changed_instance in saved
+    assert changed_stack in saved
+    assert not changed_instance.isDirty()
+    assert not changed_stack.isDirty()
+
+
+def test_addProviderSortsByPriority(container_registry):
+    priorities = {"high": 10, "low": -1, "also_low": -1}
+    providers = []
+    for plugin_id in priorities:
+        provider = MagicMock()
+        provider.getPluginId = MagicMock(return_value = plugin_id)
+        providers.append(provider)
+
+    get_metadata = MagicMock(side_effect = lambda plugin_id: {"container_provider": {"priority": priorities.get(plugin_id, 0)}})
+    with patch("UM.PluginRegistry.PluginRegistry.getMetaData", get_metadata):
+        for provider in providers:
+            container_registry.addProvider(provider)
+
+    # Providers with the same priority must stay in the order they were added in.
+    assert [provider.getPluginId() for provider in container_registry._providers if provider in providers] == ["low", "also_low", "high"]
+    assert get_metadata.call_count == len(priorities)  # The priority of each plug-in is only looked up once.
+
+
 ##  Tests the loading of containers into the registry.
 #
 #   \param container_registry A new container registry from a fixture.
@@ -534,6 +714,12 @@ def test_uniqueName(container_registry):
 
     assert container_registry.uniqueName("carlo #7") == "carlo #7"
 
+    # Names of existing containers are taken too, but unlike IDs they are matched case-sensitively.
+    mock_container = MockContainer(metadata = {"id": "some_id", "name": "Fancy"})
+    container_registry.addContainer(mock_container)
+    assert container_registry.uniqueName("Fancy") == "Fancy #2"
+    assert container_registry.uniqueName("fancy") == "fancy"
+
 ##  Helper function to verify if the metadata of the answers matches required
 #   metadata.
 #